@@ -2,7 +2,6 @@
 from flask import Flask, render_template, request, jsonify, redirect, url_for, session, render_template_string
 from functools import wraps
 import pickle
-import re
 from datetime import datetime
 import pytesseract
 from PIL import Image
@@ -12,6 +11,9 @@ from itsdangerous import URLSafeTimedSerializer, SignatureExpired, BadSignature
 import smtplib
 from email.message import EmailMessage
 import os
+import article_store
+from article_store import clean_text
+import near_duplicate
 
 app = Flask(__name__)
 
@@ -25,6 +27,13 @@ EMAIL_USER = os.environ.get("EMAIL_USER", "you@example.com")
 EMAIL_PASS = os.environ.get("EMAIL_PASS", "your-email-password")
 EMAIL_FROM = os.environ.get("EMAIL_FROM", EMAIL_USER)
 
+# "annotate": run the model and also report any near-duplicate earlier verdict
+# "reuse":    return the earlier verdict instead of running the model
+NEAR_DUP_MODE = os.environ.get("NEAR_DUP_MODE", "annotate")
+
+# zlib-compress article bodies in the articles table ("0" stores them as-is)
+COMPRESS_ARTICLES = os.environ.get("COMPRESS_ARTICLES", "1") == "1"
+
 serializer = URLSafeTimedSerializer(app.secret_key)
 
 # ---------- TESSERACT PATH ----------
@@ -41,6 +50,7 @@ DB_PATH = "database.db"
 def get_db_connection():
     conn = sqlite3.connect(DB_PATH)
     conn.row_factory = sqlite3.Row
+    article_store.register_functions(conn)
     return conn
 
 def init_db():
@@ -60,8 +70,8 @@ def init_db():
     cursor.execute("""
         CREATE TABLE IF NOT EXISTS history (
             id INTEGER PRIMARY KEY AUTOINCREMENT,
-            original TEXT,
-            cleaned TEXT,
+            original_article_id INTEGER REFERENCES articles(id),
+            cleaned_article_id INTEGER REFERENCES articles(id),
             prediction TEXT,
             confidence REAL,
             timestamp TEXT,
@@ -76,7 +86,20 @@ def init_db():
     if "user_id" not in columns:
         cursor.execute("ALTER TABLE history ADD COLUMN user_id INTEGER")
 
+    # Databases that pre-date article_store keep text inline in history.
+    # Migrating rewrites the history table, so it is left to migrate_db.py,
+    # which takes a backup first.
+    if article_store.needs_migration(conn):
+        conn.close()
+        raise RuntimeError(f"{DB_PATH} uses the old history schema. Run: python migrate_db.py {DB_PATH}")
+
+    article_store.create_tables(conn)
+    near_duplicate.create_index_tables(conn)
     conn.commit()
+
+    # History recorded before the near-duplicate index existed
+    near_duplicate.backfill_index(conn)
+
     conn.close()
 
 init_db()
@@ -100,23 +123,40 @@ def send_reset_email(to_email, token):
     except Exception as e:
         return False, str(e)
 
-def clean_text(text):
-    text = re.sub(r"http\S+", "", text)
-    text = re.sub(r"[^a-zA-Z ]", " ", text)
-    text = text.lower()
-    text = re.sub(r"\s+", " ", text).strip()
-    return text
-
 def save_history(original, cleaned, prediction, confidence, timestamp, user_id=None):
     conn = get_db_connection()
     cursor = conn.cursor()
+    original_id = article_store.put_article(conn, original, COMPRESS_ARTICLES)
+    # cleaned is normally clean_text(original), which history_articles derives
+    # on read; only store it when it differs
+    cleaned_id = None
+    if cleaned != clean_text(original):
+        cleaned_id = article_store.put_article(conn, cleaned, COMPRESS_ARTICLES)
     cursor.execute(
-        "INSERT INTO history (original, cleaned, prediction, confidence, timestamp, user_id) VALUES (?, ?, ?, ?, ?, ?)",
-        (original, cleaned, prediction, confidence, timestamp, user_id)
+        "INSERT INTO history (original_article_id, cleaned_article_id, prediction, confidence, timestamp, user_id) VALUES (?, ?, ?, ?, ?, ?)",
+        (original_id, cleaned_id, prediction, confidence, timestamp, user_id)
     )
+    article_store.index_history(conn, cursor.lastrowid, original)
+    near_duplicate.index_entry(conn, cursor.lastrowid, cleaned)
     conn.commit()
     conn.close()
 
+def find_near_duplicate(cleaned, user_id=None):
+    conn = get_db_connection()
+    match = near_duplicate.find_near_duplicate(conn, cleaned, user_id)
+    conn.close()
+    return match
+
+def classify(cleaned, user_id=None):
+    """Return (prediction, confidence, near-duplicate match or None)."""
+    match = find_near_duplicate(cleaned, user_id)
+    if match and NEAR_DUP_MODE == "reuse":
+        return match["prediction"], match["confidence"], match
+
+    pred = PIPELINE.predict([cleaned])[0]
+    prob = round(max(PIPELINE.predict_proba([cleaned])[0]) * 100, 2)
+    return pred, prob, match
+
 # -------------------- AUTH HELPERS --------------------
 def create_user(name, email, password):
     password_hash = generate_password_hash(password)
@@ -328,8 +368,7 @@ def predict_text():
                                timestamp=datetime.now().strftime("%Y-%m-%d %H:%M:%S"))
 
     cleaned = clean_text(text)
-    pred = PIPELINE.predict([cleaned])[0]
-    prob = round(max(PIPELINE.predict_proba([cleaned])[0]) * 100, 2)
+    pred, prob, match = classify(cleaned, session.get("user_id"))
 
     timestamp_value = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
     save_history(text, cleaned, pred, prob, timestamp_value, session.get("user_id"))
@@ -339,7 +378,8 @@ def predict_text():
                            confidence=prob,
                            original=text,
                            cleaned=cleaned,
-                           timestamp=timestamp_value)
+                           timestamp=timestamp_value,
+                           near_duplicate=match)
 
 
 @app.route("/predict_image", methods=["POST"])
@@ -359,8 +399,7 @@ def predict_image():
     text = pytesseract.image_to_string(Image.open("uploaded.png"))
 
     cleaned = clean_text(text)
-    pred = PIPELINE.predict([cleaned])[0]
-    prob = round(max(PIPELINE.predict_proba([cleaned])[0]) * 100, 2)
+    pred, prob, match = classify(cleaned, session.get("user_id"))
 
     timestamp_value = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
     save_history(text, cleaned, pred, prob, timestamp_value, session.get("user_id"))
@@ -370,7 +409,8 @@ def predict_image():
                            confidence=prob,
                            original=text,
                            cleaned=cleaned,
-                           timestamp=timestamp_value)
+                           timestamp=timestamp_value,
+                           near_duplicate=match)
 
 
 # ============================================================
@@ -417,12 +457,26 @@ def chart_data():
 def history():
     conn = get_db_connection()
     cursor = conn.cursor()
-    cursor.execute("SELECT * FROM history WHERE user_id = ? ORDER BY id DESC", (session["user_id"],))
+    cursor.execute("SELECT * FROM history_articles WHERE user_id = ? ORDER BY id DESC", (session["user_id"],))
     rows = cursor.fetchall()
     conn.close()
     return render_template("history.html", records=rows, user_name=session.get("user_name"))
 
 
+@app.route("/history/search")
+@login_required
+def search_history():
+    query = request.args.get("q", "").strip()
+    page = max(request.args.get("page", 1, type=int), 1)
+    per_page = min(max(request.args.get("per_page", 20, type=int), 1), 100)
+
+    conn = get_db_connection()
+    results = article_store.search_history(conn, session["user_id"], query,
+                                           limit=per_page, offset=(page - 1) * per_page)
+    conn.close()
+    return jsonify({"query": query, "page": page, "per_page": per_page, "results": results})
+
+
 # ============================================================
 # RUN APP
 # ============================================================
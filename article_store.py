@@ -0,0 +1,251 @@
+# article_store.py
+# Content-addressed, optionally zlib-compressed storage for article text, plus
+# an FTS5 index over each user's history.
+#
+# history rows reference rows of the articles table (original_article_id,
+# cleaned_article_id), keyed by the sha256 of the text, instead of holding two
+# full TEXT copies. The history_articles view puts the text back together.
+# cleaned is almost always clean_text(original), so cleaned_article_id is NULL
+# and the view derives it; it is only stored when it differs.
+#
+# The view calls article_text() and clean_text(), Python functions that SQLite
+# does not know about until register_functions() has been run on the
+# connection. The FTS5
+# index reads its content through the same view, so 'rebuild', snippet() and
+# highlight() need it too. A plain sqlite3 connection (the sqlite3 CLI, a
+# backup or reporting script) can read every table, but selecting from
+# history_articles or using those FTS functions fails with
+# "no such function: article_text". Copy-level backups (.backup, cp) are fine.
+import hashlib
+import html
+import re
+import zlib
+
+MIN_COMPRESS_SIZE = 64          # shorter texts are not worth a zlib header
+
+_MARK_START, _MARK_END = "\x02", "\x03"
+
+
+# -------------------- ARTICLE BODIES --------------------
+def clean_text(text):
+    if text is None:
+        return None
+    text = re.sub(r"http\S+", "", text)
+    text = re.sub(r"[^a-zA-Z ]", " ", text)
+    text = text.lower()
+    text = re.sub(r"\s+", " ", text).strip()
+    return text
+
+
+def article_text(body, compressed):
+    if body is None:
+        return None
+    if compressed:
+        body = zlib.decompress(body)
+    return bytes(body).decode("utf-8")
+
+
+def register_functions(conn):
+    conn.create_function("article_text", 2, article_text, deterministic=True)
+    conn.create_function("clean_text", 1, clean_text, deterministic=True)
+
+
+def put_article(conn, text, compress=True):
+    """Store text once and return its articles.id. The caller commits."""
+    if text is None:
+        return None
+    raw = text.encode("utf-8")
+    digest = hashlib.sha256(raw).digest()
+
+    body, compressed = raw, 0
+    if compress and len(raw) >= MIN_COMPRESS_SIZE:
+        packed = zlib.compress(raw, 9)
+        if len(packed) < len(raw):
+            body, compressed = packed, 1
+
+    conn.execute(
+        "INSERT OR IGNORE INTO articles (hash, body, compressed) VALUES (?, ?, ?)",
+        (digest, body, compressed)
+    )
+    return conn.execute("SELECT id FROM articles WHERE hash = ?", (digest,)).fetchone()[0]
+
+
+# -------------------- SCHEMA --------------------
+def create_tables(conn):
+    cursor = conn.cursor()
+
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS articles (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            hash BLOB UNIQUE,
+            body BLOB,
+            compressed INTEGER
+        )
+    """)
+
+    cursor.execute("PRAGMA table_info(history)")
+    columns = [col[1] for col in cursor.fetchall()]
+    if "original_article_id" not in columns:
+        cursor.execute("ALTER TABLE history ADD COLUMN original_article_id INTEGER REFERENCES articles(id)")
+    if "cleaned_article_id" not in columns:
+        cursor.execute("ALTER TABLE history ADD COLUMN cleaned_article_id INTEGER REFERENCES articles(id)")
+
+    # Always recreated so databases keep up with changes to its definition
+    cursor.execute("DROP VIEW IF EXISTS history_articles")
+    cursor.execute("""
+        CREATE VIEW history_articles AS
+        SELECT h.id,
+               article_text(o.body, o.compressed) AS original,
+               CASE WHEN h.cleaned_article_id IS NULL
+                    THEN clean_text(article_text(o.body, o.compressed))
+                    ELSE article_text(c.body, c.compressed)
+               END AS cleaned,
+               h.prediction,
+               h.confidence,
+               h.timestamp,
+               h.user_id
+        FROM history h
+        LEFT JOIN articles o ON o.id = h.original_article_id
+        LEFT JOIN articles c ON c.id = h.cleaned_article_id
+    """)
+
+    # External-content FTS5 table: the index only stores tokens, snippets are
+    # read back through the view
+    cursor.execute("""
+        CREATE VIRTUAL TABLE IF NOT EXISTS history_fts USING fts5(
+            original,
+            content='history_articles',
+            content_rowid='id'
+        )
+    """)
+
+
+def index_history(conn, history_id, original):
+    """Add one history row to the full-text index. The caller commits."""
+    conn.execute(
+        "INSERT INTO history_fts (rowid, original) VALUES (?, ?)",
+        (history_id, original or "")
+    )
+
+
+# -------------------- MIGRATION --------------------
+def needs_migration(conn):
+    columns = [col[1] for col in conn.execute("PRAGMA table_info(history)").fetchall()]
+    return "original" in columns or "cleaned" in columns
+
+
+def migrate_history(conn, compress=True, batch_size=1000):
+    """Move inline original/cleaned text into articles and rebuild the FTS index.
+
+    The history table is rebuilt without the original and cleaned columns,
+    so this works on any SQLite version and runs only once. The whole
+    migration, schema changes included, runs in one explicit transaction
+    and is rolled back on error. Returns the number of rows moved.
+    """
+    if not needs_migration(conn):
+        return 0
+
+    register_functions(conn)
+    if conn.in_transaction:
+        conn.commit()
+    # sqlite3 runs DDL in autocommit mode unless a transaction is already open
+    conn.execute("BEGIN")
+    try:
+        moved = _migrate_rows(conn, compress, batch_size)
+    except Exception:
+        conn.rollback()
+        raise
+    conn.commit()
+    return moved
+
+
+def _migrate_rows(conn, compress, batch_size):
+    create_tables(conn)
+
+    moved, last_id = 0, 0
+    while True:
+        rows = conn.execute(
+            """SELECT id, original, cleaned FROM history
+               WHERE id > ? AND original_article_id IS NULL
+               ORDER BY id LIMIT ?""",
+            (last_id, batch_size)
+        ).fetchall()
+        if not rows:
+            break
+        for history_id, original, cleaned in rows:
+            cleaned_id = None
+            if cleaned != clean_text(original):
+                cleaned_id = put_article(conn, cleaned, compress)
+            conn.execute(
+                "UPDATE history SET original_article_id = ?, cleaned_article_id = ? WHERE id = ?",
+                (put_article(conn, original, compress), cleaned_id, history_id)
+            )
+        moved += len(rows)
+        last_id = rows[-1][0]
+
+    # Rebuild rather than DROP COLUMN, which needs SQLite 3.35. The view is
+    # dropped first so the rename does not trip over its reference to history.
+    conn.execute("DROP VIEW IF EXISTS history_articles")
+    conn.execute("""
+        CREATE TABLE history_new (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            original_article_id INTEGER REFERENCES articles(id),
+            cleaned_article_id INTEGER REFERENCES articles(id),
+            prediction TEXT,
+            confidence REAL,
+            timestamp TEXT,
+            user_id INTEGER,
+            FOREIGN KEY (user_id) REFERENCES users(id)
+        )
+    """)
+    conn.execute("""
+        INSERT INTO history_new (id, original_article_id, cleaned_article_id, prediction, confidence, timestamp, user_id)
+        SELECT id, original_article_id, cleaned_article_id, prediction, confidence, timestamp, user_id FROM history
+    """)
+    conn.execute("DROP TABLE history")
+    conn.execute("ALTER TABLE history_new RENAME TO history")
+    create_tables(conn)
+
+    conn.execute("INSERT INTO history_fts (history_fts) VALUES ('rebuild')")
+    return moved
+
+
+# -------------------- SEARCH --------------------
+def fts_query(text):
+    # Quote every word so user input can never be parsed as FTS5 syntax
+    words = re.findall(r"\w+", text or "")
+    return " ".join(f'"{w}"' for w in words)
+
+
+def search_history(conn, user_id, text, limit=20, offset=0):
+    """Return one user's history rows matching text, best match first."""
+    query = fts_query(text)
+    if not query:
+        return []
+
+    rows = conn.execute(
+        """SELECT h.id, h.prediction, h.confidence, h.timestamp,
+                  snippet(history_fts, 0, ?, ?, '...', 16) AS snippet,
+                  bm25(history_fts) AS rank
+           FROM history_fts
+           JOIN history h ON h.id = history_fts.rowid
+           WHERE history_fts MATCH ? AND h.user_id = ?
+           ORDER BY rank
+           LIMIT ? OFFSET ?""",
+        (_MARK_START, _MARK_END, query, user_id, limit, offset)
+    ).fetchall()
+
+    results = []
+    for row in rows:
+        # Escape the article text, then turn the match markers into <mark> tags
+        snippet = html.escape(row[4] or "")
+        snippet = snippet.replace(_MARK_START, "<mark>").replace(_MARK_END, "</mark>")
+        results.append({
+            "id": row[0],
+            "prediction": row[1],
+            "confidence": row[2],
+            "timestamp": row[3],
+            "snippet": snippet,
+            "rank": row[5],
+        })
+    return results
@@ -0,0 +1,100 @@
+# bench_near_duplicate.py
+# Lookup latency and memory of the near-duplicate index on a synthetic history.
+#   python bench_near_duplicate.py [num_articles] [db_path]
+import os
+import random
+import resource
+import sqlite3
+import sys
+import time
+
+import near_duplicate
+
+N_ARTICLES = int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000
+DB_PATH = sys.argv[2] if len(sys.argv) > 2 else "bench_near_duplicate.db"
+N_QUERIES = 1000
+WORDS_PER_ARTICLE = 200
+
+rng = random.Random(42)
+VOCAB = ["".join(rng.choice("abcdefghijklmnopqrstuvwxyz") for _ in range(rng.randint(3, 9)))
+         for _ in range(20000)]
+
+
+def make_article():
+    return " ".join(rng.choices(VOCAB, k=WORDS_PER_ARTICLE))
+
+
+def edit(article):
+    # New headline and trailing boilerplate, like a re-posted story
+    words = article.split()
+    return " ".join(rng.choices(VOCAB, k=5) + words[3:] + rng.choices(VOCAB, k=5))
+
+
+def percentile(values, pct):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * pct / 100))]
+
+
+if os.path.exists(DB_PATH):
+    os.remove(DB_PATH)
+
+conn = sqlite3.connect(DB_PATH)
+conn.execute("""
+    CREATE TABLE history (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        original TEXT,
+        cleaned TEXT,
+        prediction TEXT,
+        confidence REAL,
+        timestamp TEXT,
+        user_id INTEGER
+    )
+""")
+near_duplicate.create_index_tables(conn)
+
+print(f"Indexing {N_ARTICLES} synthetic articles...")
+samples = {}
+start = time.perf_counter()
+for i in range(1, N_ARTICLES + 1):
+    article = make_article()
+    # Only the index is under test; keep the history rows themselves small
+    conn.execute(
+        "INSERT INTO history (id, original, cleaned, prediction, confidence, timestamp) VALUES (?, '', '', ?, ?, '')",
+        (i, rng.choice(["FAKE", "REAL"]), 90.0)
+    )
+    near_duplicate.index_entry(conn, i, article)
+    if len(samples) < N_QUERIES // 2 and rng.random() < N_QUERIES / N_ARTICLES:
+        samples[i] = article
+    if i % 100_000 == 0:
+        conn.commit()
+        print(f"  {i} rows, {time.perf_counter() - start:.0f}s")
+conn.commit()
+build_seconds = time.perf_counter() - start
+
+queries = [(i, edit(a)) for i, a in samples.items()]
+queries += [(None, make_article()) for _ in range(N_QUERIES - len(queries))]
+
+# Split the cost: MinHash of the submission vs. the index lookup itself
+sig_times, lookup_times, hits, correct = [], [], 0, 0
+for expected, text in queries:
+    t0 = time.perf_counter()
+    sig = near_duplicate.signature(text)
+    t1 = time.perf_counter()
+    match = near_duplicate.find_by_signature(conn, sig)
+    t2 = time.perf_counter()
+    sig_times.append((t1 - t0) * 1000)
+    lookup_times.append((t2 - t1) * 1000)
+    if match:
+        hits += 1
+        correct += match["history_id"] == expected
+conn.close()
+
+print()
+print(f"Articles indexed       : {N_ARTICLES}")
+print(f"Build time             : {build_seconds:.1f}s")
+print(f"Database size          : {os.path.getsize(DB_PATH) / 1024 ** 2:.1f} MiB")
+print(f"Peak RSS               : {resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024:.1f} MiB")
+print(f"Queries                : {len(queries)} ({len(samples)} edited copies)")
+print(f"Matches (correct)      : {hits} ({correct})")
+print(f"Signature  p50 / p99   : {percentile(sig_times, 50):.3f} / {percentile(sig_times, 99):.3f} ms")
+print(f"Index lookup p50 / p99 : {percentile(lookup_times, 50):.3f} / {percentile(lookup_times, 99):.3f} ms")
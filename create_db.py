@@ -1,6 +1,10 @@
 import sqlite3
+import sys
+import article_store
+import near_duplicate
 
 conn = sqlite3.connect("database.db")
+article_store.register_functions(conn)
 cursor = conn.cursor()
 
 cursor.execute("""
@@ -16,8 +20,8 @@ CREATE TABLE IF NOT EXISTS users (
 cursor.execute("""
 CREATE TABLE IF NOT EXISTS history (
     id INTEGER PRIMARY KEY AUTOINCREMENT,
-    original TEXT,
-    cleaned TEXT,
+    original_article_id INTEGER REFERENCES articles(id),
+    cleaned_article_id INTEGER REFERENCES articles(id),
     prediction TEXT,
     confidence REAL,
     timestamp TEXT,
@@ -31,7 +35,18 @@ columns = [col[1] for col in cursor.fetchall()]
 if "user_id" not in columns:
     cursor.execute("ALTER TABLE history ADD COLUMN user_id INTEGER")
 
+if article_store.needs_migration(conn):
+    conn.close()
+    print("database.db uses the old history schema. Run: python migrate_db.py")
+    sys.exit(1)
+
+article_store.create_tables(conn)
+near_duplicate.create_index_tables(conn)
+
 conn.commit()
+
+near_duplicate.backfill_index(conn)
+
 conn.close()
 
 print("Database & tables created successfully!")
@@ -0,0 +1,106 @@
+# migrate_db.py
+# Move history text into the content-addressed articles table, build the FTS5
+# index, fill the near-duplicate index, and report database size and search
+# latency before and after.
+#   python migrate_db.py [database.db] [--no-compress]
+#
+# app.py and create_db.py refuse to start on an unmigrated database. After
+# migrating, history text is only readable through the history_articles view,
+# which needs article_store.register_functions() on the connection. A plain
+# sqlite3 connection gets "no such function: article_text" from that view
+# and from the FTS5 snippet() / 'rebuild' commands.
+import os
+import random
+import shutil
+import sqlite3
+import sys
+import time
+
+import article_store
+import near_duplicate
+
+args = [a for a in sys.argv[1:] if not a.startswith("--")]
+DB_PATH = args[0] if args else "database.db"
+COMPRESS = "--no-compress" not in sys.argv
+N_QUERIES = 200
+
+
+def size_mib(path):
+    return os.path.getsize(path) / 1024 ** 2
+
+
+def sample_queries(conn):
+    rng = random.Random(42)
+    rows = conn.execute(
+        "SELECT user_id, original FROM history ORDER BY RANDOM() LIMIT ?", (N_QUERIES,)
+    ).fetchall()
+    queries = []
+    for user_id, text in rows:
+        words = [w for w in (text or "").split() if len(w) > 4]
+        if words:
+            queries.append((user_id, rng.choice(words)))
+    return queries
+
+
+def time_queries(search, queries):
+    times = []
+    for user_id, word in queries:
+        start = time.perf_counter()
+        search(user_id, word)
+        times.append((time.perf_counter() - start) * 1000)
+    times.sort()
+    if not times:
+        return "n/a"
+    return f"p50 {times[len(times) // 2]:.2f} ms, p99 {times[min(len(times) - 1, int(len(times) * 0.99))]:.2f} ms"
+
+
+if not os.path.exists(DB_PATH):
+    print(f"{DB_PATH} not found")
+    sys.exit(1)
+
+conn = sqlite3.connect(DB_PATH)
+article_store.register_functions(conn)
+
+if not article_store.needs_migration(conn):
+    print(f"{DB_PATH} is already migrated.")
+    conn.close()
+    sys.exit(0)
+
+backup = DB_PATH + ".bak"
+shutil.copy(DB_PATH, backup)
+print(f"Backup written to {backup}")
+
+# ---------- BEFORE: text inline, search is a LIKE scan ----------
+size_before = size_mib(DB_PATH)
+queries = sample_queries(conn)
+latency_before = time_queries(
+    lambda user_id, word: conn.execute(
+        "SELECT id, original FROM history WHERE user_id = ? AND original LIKE ? ORDER BY id DESC",
+        (user_id, f"%{word}%")
+    ).fetchall(),
+    queries
+)
+
+# ---------- MIGRATE ----------
+start = time.perf_counter()
+moved = article_store.migrate_history(conn, compress=COMPRESS)
+migrate_seconds = time.perf_counter() - start
+conn.execute("VACUUM")
+
+# ---------- AFTER: articles table + FTS5 ----------
+size_after = size_mib(DB_PATH)
+latency_after = time_queries(
+    lambda user_id, word: article_store.search_history(conn, user_id, word),
+    queries
+)
+articles = conn.execute("SELECT COUNT(*) FROM articles").fetchone()[0]
+
+# Not included in the size above: the index belongs to near_duplicate
+near_duplicate.create_index_tables(conn)
+indexed = near_duplicate.backfill_index(conn)
+conn.close()
+
+print(f"Rows migrated   : {moved} ({articles} distinct article bodies, {migrate_seconds:.1f}s)")
+print(f"Database size   : {size_before:.1f} MiB -> {size_after:.1f} MiB")
+print(f"Search latency  : {latency_before} (LIKE) -> {latency_after} (FTS5)")
+print(f"Near-duplicate  : {indexed} history rows indexed")
@@ -0,0 +1,216 @@
+# near_duplicate.py
+# MinHash / LSH index over history.cleaned, stored in the same SQLite database
+# so it survives restarts and is updated in the same transaction as history.
+import hashlib
+import sqlite3
+import sys
+import zlib
+
+import numpy as np
+
+import article_store
+
+# -------------------- CONFIG --------------------
+NUM_PERM = 128          # MinHash signature length
+BANDS = 16              # LSH bands; NUM_PERM / BANDS rows per band
+ROWS = NUM_PERM // BANDS
+SHINGLE_SIZE = 3        # words per shingle
+MIN_WORDS = 10          # shorter texts are neither indexed nor matched
+MIN_SIMILARITY = 0.8    # estimated Jaccard needed to report a match
+
+_PRIME = np.uint64(4294967291)   # largest prime below 2**32
+_rng = np.random.RandomState(2111)
+# a < 2**31 keeps a * x (x < 2**32) inside uint64 without overflow
+_A = _rng.randint(1, 2**31 - 1, size=NUM_PERM).astype(np.uint64)
+_B = _rng.randint(0, 2**31 - 1, size=NUM_PERM).astype(np.uint64)
+
+
+# -------------------- SIGNATURES --------------------
+def shingles(cleaned):
+    # A handful of words says nothing about whether two stories are the same
+    words = cleaned.split()
+    if len(words) < MIN_WORDS:
+        return set()
+    return {" ".join(words[i:i + SHINGLE_SIZE]) for i in range(len(words) - SHINGLE_SIZE + 1)}
+
+
+def signature(cleaned):
+    """Return the MinHash signature of a cleaned text, or None if it is too short."""
+    items = shingles(cleaned)
+    if not items:
+        return None
+    hashes = np.fromiter((zlib.crc32(s.encode()) for s in items), dtype=np.uint64, count=len(items))
+    permuted = (np.outer(_A, hashes) + _B[:, None]) % _PRIME
+    return permuted.min(axis=1).astype(np.uint32)
+
+
+def band_keys(sig):
+    keys = []
+    for band in range(BANDS):
+        chunk = sig[band * ROWS:(band + 1) * ROWS].tobytes()
+        digest = hashlib.blake2b(bytes([band]) + chunk, digest_size=8).digest()
+        keys.append(int.from_bytes(digest, "little", signed=True))
+    return keys
+
+
+def similarity(sig_a, sig_b):
+    return float(np.count_nonzero(sig_a == sig_b)) / NUM_PERM
+
+
+# -------------------- STORAGE --------------------
+def create_index_tables(conn):
+    cursor = conn.cursor()
+
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS minhash_signatures (
+            history_id INTEGER PRIMARY KEY,
+            signature BLOB,
+            FOREIGN KEY (history_id) REFERENCES history(id)
+        )
+    """)
+
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS minhash_buckets (
+            bucket INTEGER,
+            history_id INTEGER
+        )
+    """)
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_minhash_buckets ON minhash_buckets (bucket)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_minhash_buckets_history ON minhash_buckets (history_id)")
+
+    # Records that the index covers all of history, even if no row was long
+    # enough to get a signature
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS minhash_meta (
+            key TEXT PRIMARY KEY,
+            value TEXT
+        )
+    """)
+
+
+def index_entry(conn, history_id, cleaned, replace=True):
+    """Add one history row to the index. The caller commits.
+
+    Returns False if the text is too short to index. replace=False skips
+    clearing old buckets for history_id, for callers that know there are none.
+    """
+    sig = signature(cleaned or "")
+    if sig is None:
+        return False
+    conn.execute(
+        "INSERT OR REPLACE INTO minhash_signatures (history_id, signature) VALUES (?, ?)",
+        (history_id, sig.tobytes())
+    )
+    if replace:
+        conn.execute("DELETE FROM minhash_buckets WHERE history_id = ?", (history_id,))
+    conn.executemany(
+        "INSERT INTO minhash_buckets (bucket, history_id) VALUES (?, ?)",
+        [(key, history_id) for key in band_keys(sig)]
+    )
+    return True
+
+
+def find_near_duplicate(conn, cleaned, user_id=None, min_similarity=MIN_SIMILARITY):
+    """Return the most similar earlier prediction as a dict, or None.
+
+    The dict holds the prediction, confidence and estimated Jaccard similarity
+    between the two cleaned texts. history_id and timestamp are only included
+    when the earlier prediction belongs to user_id.
+    """
+    sig = signature(cleaned or "")
+    if sig is None:
+        return None
+    return find_by_signature(conn, sig, user_id, min_similarity)
+
+
+def find_by_signature(conn, sig, user_id=None, min_similarity=MIN_SIMILARITY):
+    keys = band_keys(sig)
+    placeholders = ",".join("?" * len(keys))
+    rows = conn.execute(
+        f"""SELECT s.history_id, s.signature FROM minhash_signatures s
+            WHERE s.history_id IN (
+                SELECT history_id FROM minhash_buckets WHERE bucket IN ({placeholders})
+            )""",
+        keys
+    ).fetchall()
+
+    if not rows:
+        return None
+
+    # Highest similarity wins; ties go to the most recent prediction
+    best_score, best_id = max(
+        (similarity(sig, np.frombuffer(blob, dtype=np.uint32)), history_id)
+        for history_id, blob in rows
+    )
+    if best_score < min_similarity:
+        return None
+
+    row = conn.execute(
+        "SELECT prediction, confidence, timestamp, user_id FROM history WHERE id = ?", (best_id,)
+    ).fetchone()
+    if row is None:
+        return None
+
+    match = {
+        "prediction": row[0],
+        "confidence": row[1],
+        "similarity": round(best_score, 4),
+    }
+    # Other users' history stays private: only the verdict is shared
+    if row[3] == user_id:
+        match["history_id"] = best_id
+        match["timestamp"] = row[2]
+    return match
+
+
+def rebuild_index(conn, batch_size=1000):
+    """Drop and rebuild the whole index from history.cleaned. Returns rows indexed.
+
+    conn must have article_store.register_functions() applied.
+    """
+    conn.execute("DROP TABLE IF EXISTS minhash_buckets")
+    conn.execute("DROP TABLE IF EXISTS minhash_signatures")
+    create_index_tables(conn)
+
+    count = 0
+    read = conn.cursor()
+    read.execute("SELECT id, cleaned FROM history_articles ORDER BY id")
+    while True:
+        batch = read.fetchmany(batch_size)
+        if not batch:
+            break
+        for history_id, cleaned in batch:
+            # The tables were just dropped, so there are no old buckets to clear
+            count += index_entry(conn, history_id, cleaned, replace=False)
+    mark_built(conn)
+    conn.commit()
+    return count
+
+
+def mark_built(conn):
+    conn.execute("INSERT OR REPLACE INTO minhash_meta (key, value) VALUES ('built', '1')")
+
+
+def backfill_index(conn):
+    """Build the index once for history recorded before it existed. Returns rows indexed."""
+    if conn.execute("SELECT 1 FROM minhash_meta WHERE key = 'built'").fetchone():
+        return 0
+    if not conn.execute("SELECT 1 FROM history LIMIT 1").fetchone():
+        mark_built(conn)
+        conn.commit()
+        return 0
+    return rebuild_index(conn)
+
+
+# -------------------- CLI --------------------
+if __name__ == "__main__":
+    if len(sys.argv) < 2 or sys.argv[1] != "rebuild":
+        print("Usage: python near_duplicate.py rebuild [database.db]")
+        sys.exit(1)
+
+    db_path = sys.argv[2] if len(sys.argv) > 2 else "database.db"
+    conn = sqlite3.connect(db_path)
+    article_store.register_functions(conn)
+    total = rebuild_index(conn)
+    conn.close()
+    print(f"Near-duplicate index rebuilt: {total} history rows indexed.")